@@ -1 +1,3 @@
-from hformat.hformat import HumanFormatter, hformat, hf, hfprint, hfconfig
+from hformat.hformat import HumanFormatter, HFTemplate, HFDocument, \
+	HFCatalog, HFMessage, HFAdapter, HFFormatter, hformat, hf, hfprint, \
+	hfconfig, hfpreset, hfcache_info, hfcache_clear, translate
@@ -33,11 +33,27 @@
 		- Allow some HTML and Markdown syntaxis, but just as literal conversions
 		to hformat, without further specific code (v3).
 """
+import os
 import sys
+import ast
 import inspect
+import logging
+import builtins
+import re
+import mmap
+import codecs
+import threading
 import random
+import string
+import functools
+import itertools
+import numbers
+import unicodedata
+import json
 import yaml
 from pprint import pprint
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 #
 # Definitions and globals.
@@ -60,30 +76,46 @@ STYLES = ["bold", "dark", "underline", "blink", "reverse", "canceled"]
 CONTEXT_CHAR_ID = '@'
 LITERAL_CHAR_ID = '?'
 PARAM_CHAR_ID = '%'
+PRINTF_TYPES = "dfFeEgG%"	# Types printf-style patterns can express.
+NATIVE_TYPES = (str, int, float)	# Types rendered natively by str.format.
+MEMO_TYPES = (str, int, float, bool)	# Types whose renderings are memoized.
 
 #	Extern files:
 FUNCTIONS_PATH = "../files/fcndefs.yml"
 
+#	Encodings where '{', '}' and '\\' bytes always are those chars:
+STREAM_ENCODINGS = ('utf-8', 'ascii', 'iso8859-1')
+
+#	Presets registered with hfpreset, <name>: <specs>; and lexed ones cache.
+PRESETS = dict()
+_LEXED_PRESETS = dict()
+
 #	Placeholders:
 COMMA_PLACEHOLDER = "$$$COMMA$$$"
-FILL_PLACEHOLDER = chr(1500)
 LITERAL_COMMA_PLACEHOLDER = "$$$LITERALCOMMA$$$"
 LITERAL_POINTS_PLACEHOLDER = "$$$TWO$$$POINTS$$$"
 LITERAL_OPENPAR_PLACEHOLDER = "$$$OPEN$$$PARENTHESIS$$$"
 LITERAL_CLOSEPAR_PLACEHOLDER = "$$$CLOSE$$$PARENTHESIS$$$"
-RFILL_PLACEHOLDER = chr(1501)
 
 #	Intern keys:
 CALLING_FRAME_KEY = "__cAlLiNg_MoDuLe__"
 CONTEXT_KEY = "__cOnTeXt_KeY__"
-FILL_KEY = "__FiLl__"
 LITERAL_KEY = "__lItErAl__"
-RFILL_KEY = "__rFiLl__"
+RECORD_KEY = "hformat"	# Log record attribute marking hformat messages.
 
 #	Error messages:
+ERROR_DOCUMENT_ENCODING = "Documents can only be rendered in streaming with"\
+						  " encodings: {}"
 ERROR_EXPECTED_ARG = "'{}' function requires positional argument at {}"
+ERROR_CATALOG_ENTRY = "Catalog '{}' has wrong templates:{}"
+ERROR_CATALOG_FORMAT = "Catalog '{}' must be a mapping of keys to templates"
+ERROR_COLUMN_CLAUSE = "format_column() requires a template with a single"\
+					  " clause, with no inner clauses"
 ERROR_EXPECTED_CLOSURE = "Expected '{}' before ending string"
 ERROR_FUNCTION_SYNTAX = "Expected ')' for closing, or no openning '('"
+ERROR_PRESET_ARGS = "Preset '{}' takes no arguments"
+ERROR_PRESET_LOOP = "Preset '{}' expands into itself"
+ERROR_PRESET_NAME = "Preset '{}' would hide the hformat function with that name"
 ERROR_UNKNOWN_FUNCTION = "Unknown hformat function '{}' given"
 ERROR_WIDTH_USES_INT = "width() argument must be integers or integers preceded"\
 					   "by '+' char"
@@ -93,6 +125,9 @@ FATAL_ERROR_NO_ID = "- FATAL - Identificator key not found"
 FATAL_ERROR_NO_TERMCOLOR = "- FATAL - Termcolor module must be installed in" \
 						   "order to allow using coloring and style functions"
 
+#	Shared formatter, used to fetch and render clause values.
+_FORMATTER = string.Formatter()
+
 
 ################################################################################
 
@@ -166,14 +201,17 @@ class HumanFormatterError (Exception):
 
 class HumanFormatter (object):
 	"""This class handles the main engine of hformat.
-	It provides privates functions that achieve each part of the process.
-	Those are:
-	 1. Parsing the pseudo-language, identifying each {clause}.
-	 2. Lexing each clause, identifying commands.
-	 3. Interpreting and formatting each clause with its h-commands.
+	It parses the line into an HFTemplate, and renders it with the given
+	arguments. The process is split between them and HFClause:
+	 1. Parsing the pseudo-language, identifying each {clause} - HFTemplate.
+	 2. Lexing each clause, identifying commands - HFClause.
+	 3. Interpreting and formatting each clause with its h-commands - HFClause.
 	"""
 	HFCONFIG = {
-		'error_on_unknown_function': False
+		'error_on_unknown_function': False,
+		'display_width': False,
+		'template_cache_size': 256,
+		'value_cache_size': 0
 	}
 
 	def __init__ (self, line, *args, **kwargs):
@@ -185,28 +223,16 @@ class HumanFormatter (object):
 		# Program user configuration.
 		self.config = HumanFormatter.HFCONFIG
 
-		# Program parameters.
-		self.trans = list()
-		self.hidden = list()
-
-		# Control:
-		self.__gi = 0		# Empty clauses identificator.
-		self.__li = 0		# Literal identifiers index follower.
-		self.__fi = 1500	# Random filling unique identificator index.
-		self.__fill_dict = dict()	# Multi-char filling dictionary.
-		self.__rfill_dict = dict()	# Random filling dictionary of chars.
-		self.__limit_list = list()	# Limit char identifying list.
-		self.__decsep = ''	# Decimal separator changer.
-		self.__milsep = ''	# Thousands separator changer.
-
 		# Obtaining calling module frame, for contextual identifiers:
 		if CALLING_FRAME_KEY in self.kwargs:
 			self.calling_frame = self.kwargs[CALLING_FRAME_KEY]
 		else:
-			self.calling_frame = inspect.stack()[1].frame
+			self.calling_frame = inspect.currentframe().f_back
 
 		# *** Starting program ***
-		self.final = self.__parse(self.original, True)
+		self.template = TEMPLATE_CACHE.get(self.original, self.config)
+		self.final = self.template.render(*self.args, **{**self.kwargs,
+		                                  CALLING_FRAME_KEY: self.calling_frame})
 
 
 	@staticmethod
@@ -217,83 +243,29 @@ class HumanFormatter (object):
 				HumanFormatter.HFCONFIG[key] = val
 
 
-	def __parse (self, line, first=False):
-		"""Parses a given string.
-		Identifies every substring enclosed between parenthesis {} - clause.
-		It is capable of distingish inner and outter clauses, and also ignores
-		parentheses that are not clauses. It also provides the escape char '\'.
-		'first' parameter identifies the first called instance, so when that one
-		ends, it will mean the parsing and formatting has ended.
-
-		It uses an spiral parsing, which means that everytime it identifies a
-		clause, calls itself agains with this clause, identifying inner clauses.
-		This way, everything in translated correctly.
-		"""
-		inside = False		# True when inside a clause.
-		ignore = 0
-		hop_next = False	# True when a {} char must be ignored.
-		subline = ""
-		for char in line:
-			if inside:
-				# This will include the closing '}', be careful.
-				subline += char
-			if hop_next and char in "}{":
-				hop_next = False
-				continue
-			if char == '{':
-				if inside is True:
-					ignore += 1
-				else:
-					inside = True
-			elif char == '}':
-				if ignore == 0:
-					# In order to identify inner clauses, __parse() is called
-					# again until no more clauses are found. Only then the
-					# secure translation is done.
-					inside = False
-					self.__parse(subline[:-1])
-					subline = ""
-				else:
-					ignore = (ignore-1) if (ignore-1>=0) else ignore
-			elif char == '\\':
-				hop_next = True
-
-		# Error handling:
-		if inside is True:
-			raise HumanFormatterError(ERROR_EXPECTED_CLOSURE)
-
-		# Exiting the loop will mean that this subline must be translated,
-		# or that the parsing has ended if it is the first instance:
-		if first:
-			# Replaces translations and applies format with __postproc.
-			for ori, trans in self.trans:
-				line = line.replace(ori, trans, 1)
-			return line
-		else:
-			# Translates and formats the clause, saving it in the dict.
-			self.__format(line)
+class HFClause (object):
+	"""Compiled form of a single clause.
+	The clause is lexed and its specs resolved just once, so it can be rendered
+	many times over different values. Identifiers are resolved on each
+	rendering, as they depend on the arguments given.
+	"""
+	def __init__ (self, line, config=None):
+		"""Lexes and compiles 'line', the clause without its braces."""
+		self.original = line
+		self.config = HumanFormatter.HFCONFIG if config is None else config
+		self.ids = list()		# Forced identifiers, as (kind, value) tuples.
+		self.undef = None		# Identifier to autointerprete, if any.
+		self.__presets = list()	# Presets being lexed, to detect loops.
+		self.__compile(self.__lexer(line))
 
 
-	def __format (self, line):
-		"""Translates and formats each given clause.
-		It doesn't return anything, but saves both the original clause and its
-		final formatted version in a dictionary so they can be replaced when
-		all the formatting is made. This makes secure to use onion clauses.
-		A lexer is used in order to identify what's inside a given clause.
-		"""
+	def __compile (self, aux):
+		"""Resolves the list of HFFunction given by the lexer into specs."""
 		# Control variables:
-		__replace_dict = dict()		# Replace every 'key' for its 'value'.
-		__replace_list = list()		# For each cell, replaces (0) with (1).
-
-		## Formatting what has been already translated:
-		for ori, trans in self.trans:
-			line = line.replace(ori, trans, 1)
-		original = '{' + line[:] + '}'
-		line = line.format(*self.args, **self.kwargs)
+		replace_list = list()		# For each cell, replaces (0) with (1).
+		separators = dict()			# The same, as a single translation.
 
-		## Lexing and setting up some lexer configuration.
 		# For comfort, it builds a local class to handle the list of HFFunctions.
-		aux = self.__lexer(line)
 		class LocalFitems (object):
 			def __init__ (self, fitems = aux):
 				self.fitems = fitems
@@ -311,59 +283,14 @@ class HumanFormatter (object):
 
 		fitems = LocalFitems()
 
-		## Part 1: Translating identifiers.
-		identifier = ""
-
-		# - A. Autointerprete. Will try, in order: param, context and literal.
-		#	If it finds what it is, it will include it so the following ifs
-		#	catch them.
-		if fitems.get_fitem("undef"):
-			key = fitems.fitem.get_arg(0)
-			try:
-				# Try as param.
-				_ = str('{'+key+'}').format(*self.args, **self.kwargs)
-				fitems.add_fitem("param", [{'value': key}])
-			except:
-				# Try as contextual.
-				try:
-					_ = eval(key, {**self.calling_frame.f_locals,
-					         	   **self.calling_frame.f_globals})
-					fitems.add_fitem("context", [{'value': key}])
-				except:
-					# Set as literal.
-					fitems.add_fitem("literal", [{'value': key}])
-
-
-		# - 1.1. Empty (as str.format with {}):
-		if fitems.get_fitem("noid"):
-			identifier = str(self.__gi)
-			self.__gi += 1
-
-		# - 1.2. Literals:
-		elif fitems.get_fitem("literal"):
-			identifier = LITERAL_KEY
-			self.kwargs[identifier] = fitems.fitem.get_arg()
-
-		# - 1.3. Contextual (as f-strings):
-		elif fitems.get_fitem("context"):
-			identifier = CONTEXT_KEY
-			self.kwargs[identifier] = eval(fitems.fitem.get_arg(),
-			                               {**self.calling_frame.f_locals,
-			                               **self.calling_frame.f_globals})
-
-		# - 1.4. Parameter (as str.format()):
-		elif fitems.get_fitem("param"):
-			# That's the standard behavior.
-			identifier = fitems.fitem.get_arg()
-
-		else:
-			raise SystemError(FATAL_ERROR_NO_ID)
-
-		# - Trying to force casting of value, for numerics:
-		try:
-			self.kwargs[identifier] = eval(self.kwargs[identifier])
-		except:
-			pass
+		## Part 1: Gathering identifiers.
+		for fitem in fitems.fitems:
+			if fitem.key == "undef" and self.undef is None:
+				self.undef = fitem.get_arg()
+			elif fitem.key == "noid":
+				self.ids.append((fitem.key, None))
+			elif fitem.key in ("literal", "context", "param"):
+				self.ids.append((fitem.key, fitem.get_arg()))
 
 
 		## Part 2: Translating specs:
@@ -378,14 +305,16 @@ class HumanFormatter (object):
 		lmilsep = ""
 		convert = ""
 		open_char = close_char = ""
+		limit_size = None
+		ralign = False
 		do_color = False
 
 		# - 2.1. Aligning:
 		if fitems.get_fitem("align"):
-			posdict = {"center": '^', "left": '<', "right": '>',
-						"ralign": random.choice(['^','>','<'])}
+			posdict = {"center": '^', "left": '<', "right": '>', "ralign": ''}
 			pos = fitems.fitem.get_arg()
 			align = posdict[pos]
+			ralign = (pos == "ralign")	# Chosen randomly on each rendering.
 
 			if fitems.fitem.has_arg('width'):
 				fitems.add_fitem("width", [{'size': fitems.fitem.last_arg}])
@@ -395,14 +324,13 @@ class HumanFormatter (object):
 
 
 		# - 2.2. Width:
+		relative = False
 		if fitems.get_fitem("width"):
 			sizestr = fitems.fitem.get_arg()
 			if sizestr.startswith('+'):
-				# Handles relative width.
+				# Relative width, measured once the value is rendered.
+				relative = True
 				width = int(sizestr[1:])
-				aux_id = '{' + identifier + '}'
-				aux = aux_id.format(*self.args, **self.kwargs)
-				width += len(aux)
 			else:
 				width = int(sizestr)
 
@@ -411,21 +339,16 @@ class HumanFormatter (object):
 
 
 		# - 2.3. Filling:
+		rfill = False
 		if fitems.get_fitem("fill"):
 			align = align or '<'	# There must be alignment in order to fill.
 			fill = fitems.fitem.get_arg()
-			if len(fill) > 1:
-				# Multichar filling - Placeholder and replacement system:
-				fill = '{' + FILL_KEY + '}'
-				self.kwargs[FILL_KEY] = FILL_PLACEHOLDER
-				__replace_dict[FILL_PLACEHOLDER] = fitems.fitem.get_arg()
 
 		elif fitems.get_fitem("rfill"):
 			align = align or '<'
-			# Random filling - Placeholder and replacement system:
-			fill = '{' + RFILL_KEY + '}'
-			self.kwargs[RFILL_KEY] = RFILL_PLACEHOLDER
-			__replace_dict[RFILL_PLACEHOLDER] = fitems.fitem.get_arg()
+			# Random filling, one char chosen for each padding position.
+			fill = fitems.fitem.get_arg()
+			rfill = True
 
 
 		# - 2.4. Signing:
@@ -449,13 +372,11 @@ class HumanFormatter (object):
 				fitems.add_fitem("decsep", [{'sep': fitems.fitem.last_arg}])
 
 		elif fitems.get_fitem("limit"):
-			precision = '.' + str(fitems.fitem.get_arg())
+			limit_size = fitems.fitem.get_arg()
+			precision = '.' + str(limit_size)
 			if fitems.fitem.has_arg("endchar"):
-				# Limiting ending char handling.
+				# Limiting ending char, put over the rendered value.
 				limit_char = fitems.fitem.last_arg
-				cropped = str('{'+f"{identifier}"+':'+f"{precision}"+'}'). \
-					format(*self.args, **self.kwargs)
-				__replace_list.append((cropped, cropped[:-1]+limit_char))
 
 		# - 2.7. Type casting.
 		#	- 2.7.1. Base:
@@ -493,15 +414,16 @@ class HumanFormatter (object):
 
 		# - 2.8. Decimals separators.
 		if fitems.get_fitem("decsep"):
-			sep = fitems.fitem.get_arg()
+			sep = separators['.'] = fitems.fitem.get_arg()
 			if sep == ',':
 				sep = COMMA_PLACEHOLDER
-			__replace_list.append(('.', sep))
+			replace_list.append(('.', sep))
 
 		# - 2.9. Miles separator.
 		if fitems.get_fitem("milsep"):
 			lmilsep = ','
-			__replace_list.append((',', fitems.fitem.get_arg()))
+			separators[','] = fitems.fitem.get_arg()
+			replace_list.append((',', separators[',']))
 
 
 		# - 2.10. Surrounding (custom - [cow])
@@ -527,41 +449,379 @@ class HumanFormatter (object):
 			do_color = True
 
 
-		## Part 3: Formatting and post-procesing:
-		frmt = '{' + identifier + convert + ':' + fill + align + sign + alter \
-				+ str(width) + lmilsep + precision + vtype + '}'
-		final = frmt.format(*self.args, **self.kwargs)
-
-		for key, val in __replace_dict.items():
-			if FILL_PLACEHOLDER == key:
-				# Multi-char filling:
-				total = len(val)
-				for i in range(final.count(key)):
-					final = final.replace(key, val[i%total], 1)
-			elif RFILL_PLACEHOLDER == key:
-				# Random-char filling:
-				for _ in range(final.count(key)):
-					final = final.replace(key, random.choice(val), 1)
-
-		for key, val in __replace_list:
-			# Limitters, decimal and milles separators.
+		## Saving resolved specs:
+		self.fill = fill
+		self.rfill = rfill
+		self.align = align
+		self.ralign = ralign
+		self.width = width
+		self.relative = relative
+		self.sign = sign
+		self.alter = alter
+		self.precision = precision
+		self.limit_char = limit_char
+		self.limit_size = limit_size
+		self.vtype = vtype
+		self.lmilsep = lmilsep
+		self.convert = convert
+		self.spec = sign + alter + lmilsep + precision + vtype
+		self.replace_list = replace_list
+		self.separators = str.maketrans(separators) if separators else None
+		self.open_char = open_char
+		self.close_char = close_char
+		self.do_color = do_color
+		self.set_color = set_color
+		self.set_hg = set_hg
+		self.set_style = set_style
+		self.native = self.__native()
+
+		# Limiting a str() or repr() conversion can build just what is shown.
+		self.bounded = limit_size is not None and bool(convert) and \
+		               not (sign or alter or lmilsep or vtype or relative)
+
+		# Padding left to the format spec, so that each type pads as its own
+		# __format__ does. Only _pad handles the rest.
+		self.inline = bool(width) and width > 0 and not (relative or rfill or
+		              len(fill) > 1 or limit_char or self.bounded)
+
+		# Memo of rendered values. Pointless for natively rendered clauses,
+		# and wrong for those that are random.
+		memo_size = self.config.get('value_cache_size')
+		if memo_size and self.native is None and not (ralign or rfill):
+			self.memo = HFMemo(memo_size)
+		else:
+			self.memo = None
+
+
+	def identify (self, args, kwargs, frame, counter):
+		"""Resolves the identifier of the clause for the given arguments.
+		Literal and contextual values are saved into 'kwargs', under their
+		intern keys. Empty clauses take their position from 'counter'.
+		Returns the identifier.
+		"""
+		ids = list(self.ids)
+
+		# - A. Autointerprete. Will try, in order: param, context and literal.
+		if self.undef is not None:
+			key = self.undef
+			try:
+				# Try as param.
+				_ = str('{'+key+'}').format(*args, **kwargs)
+				ids.append(("param", key))
+			except:
+				# Try as contextual.
+				try:
+					_ = eval(key, {**frame.f_locals, **frame.f_globals})
+					ids.append(("context", key))
+				except:
+					# Set as literal.
+					ids.append(("literal", key))
+
+		kinds = [kind for kind, _ in ids]
+
+		# - 1.1. Empty (as str.format with {}):
+		if "noid" in kinds:
+			identifier = str(next(counter))
+
+		# - 1.2. Literals:
+		elif "literal" in kinds:
+			identifier = LITERAL_KEY
+			kwargs[identifier] = ids[kinds.index("literal")][1]
+
+		# - 1.3. Contextual (as f-strings):
+		elif "context" in kinds:
+			identifier = CONTEXT_KEY
+			kwargs[identifier] = eval(ids[kinds.index("context")][1],
+			                          {**frame.f_locals, **frame.f_globals})
+
+		# - 1.4. Parameter (as str.format()):
+		elif "param" in kinds:
+			# That's the standard behavior.
+			identifier = ids[kinds.index("param")][1]
+
+		else:
+			raise SystemError(FATAL_ERROR_NO_ID)
+
+		# - Trying to force casting of value, for numerics. Only builtins are
+		#   seen, so names imported by this module are not taken as values:
+		try:
+			kwargs[identifier] = eval(kwargs[identifier],
+			                          {'__builtins__': builtins})
+		except:
+			pass
+
+		return identifier
+
+
+	def fold (self):
+		"""Renders the clause for good, if its output can never change.
+		That is the case of clauses identified by a constant literal whose specs
+		are all deterministic. Coloring is not folded either, as termcolor may
+		check the terminal on each call.
+		Returns the rendered clause, or None if it must be rendered each time.
+		"""
+		kinds = [kind for kind, _ in self.ids]
+		if "literal" not in kinds or "noid" in kinds or self.undef is not None \
+		   or self.ralign or self.rfill or self.do_color:
+			return None
+		if not _is_constant(self.ids[kinds.index("literal")][1]):
+			return None
+		return self.render(tuple(), dict(), None, None)
+
+
+	def render (self, args, kwargs, frame, counter):
+		"""Resolves the identifier and renders the clause with its value."""
+		identifier = self.identify(args, kwargs, frame, counter)
+		field = identifier or '0'	# A bare '{}' takes the first positional.
+		return self.render_value(_FORMATTER.get_field(field, args, kwargs)[0])
+
+
+	def render_value (self, value):
+		"""Formats 'value' with the clause specs.
+		The value is rendered just once; measuring, truncating and padding all
+		work over that same rendered string.
+		"""
+		if self.native is not None and type(value) in NATIVE_TYPES and \
+		   not (self.width and self.config['display_width']) and \
+		   not (self.bounded and self.convert == '!r' and type(value) is str):
+			# Fast path: the whole clause is a format spec.
+			if self.convert:
+				value = _FORMATTER.convert_field(value, self.convert[1])
+			return format(value, self.native)
+
+		key = None
+		if self.memo is not None and type(value) in MEMO_TYPES:
+			# Floats by their hex, so 0.0 and -0.0 don't share an entry.
+			key = (type(value), value.hex() if type(value) is float else value,
+			       self.config['display_width'])
+			final = self.memo.get(key)
+			if final is not None:
+				return final
+
+		final = self.__render_value(value)
+		if key is not None:
+			self.memo.put(key, final)
+		return final
+
+
+	def __render_value (self, value):
+		"""Formats 'value' with the clause specs, through the whole engine."""
+		final = None
+		if self.bounded:
+			if self.convert == '!s' and type(value) is str:
+				final = value[:self.limit_size]
+			else:
+				# str() and repr() are the same for the types it handles.
+				final = _bounded_repr(value, self.limit_size)
+
+		measure = display_width if self.config['display_width'] else len
+		width = self.width
+		spec = self.spec
+		if self.inline and measure is len:
+			align = random.choice(['^','>','<']) if self.ralign else self.align
+			spec = self.fill + align + self.sign + self.alter + str(width) + \
+			       self.lmilsep + self.precision + self.vtype
+			width = 0
+
+		if final is not None:
+			pass
+		elif self.convert:
+			final = _FORMATTER.format_field(
+				_FORMATTER.convert_field(value, self.convert[1]), spec)
+		else:
+			final = _FORMATTER.format_field(value, spec)
+
+		if self.relative:
+			# Relative width counts from the plain representation.
+			if self.spec or self.convert:
+				width += measure(_FORMATTER.format_field(value, ''))
+			else:
+				width += measure(final)
+
+		if self.limit_char:
+			final = final[:-1] + self.limit_char
+
+		for key, val in self.replace_list:
+			# Decimal and milles separators.
 			final = final.replace(key, val)
 
 		final = final.replace(COMMA_PLACEHOLDER, ',')
 
-		final = open_char + final + close_char
+		if width:
+			align = self.align
+			if self.ralign:
+				align = random.choice(['^','>','<'])
+			elif not align:
+				# Same default as str.format: numbers go right, others left.
+				numeric = isinstance(value, numbers.Number) and not self.convert
+				align = '>' if numeric else '<'
+			final = _pad(final, width, align, self.fill, self.rfill, measure)
+
+		return self.__decorate(final)
+
+
+	def render_column (self, values):
+		"""Formats a whole column of values with the clause specs.
+		Numeric specs are translated once into a printf-style pattern that is
+		applied to every value (or into a format spec, when grouping thousands),
+		and separators and padding are then done over the whole column. NumPy
+		arrays go through its vectorized string functions; any other sequence
+		through a batched pure-Python loop.
+		Whatever the pattern cannot express falls back to render_value.
+		Returns an array of strings for NumPy arrays, or a list otherwise.
+		"""
+		numpy = sys.modules.get('numpy')
+		if numpy is not None and isinstance(values, numpy.ndarray):
+			return self.__render_array(values, numpy)
+
+		values = list(values)
+		pattern = self.__column_pattern()
+		types = (int,) if self.vtype == 'd' else (int, float)
+		if pattern is None or not all(type(value) in types for value in values):
+			return [self.render_value(value) for value in values]
+
+		column = self.__apply_pattern(pattern, values)
+		if self.separators:
+			column = [item.translate(self.separators) for item in column]
+
+		if self.width:
+			align = self.align or '>'
+			fill = self.fill or ' '
+			measure = display_width if self.config['display_width'] else len
+			simple = len(fill) == 1 and not self.rfill and measure(fill) == 1
+			if simple and align == '>':
+				column = [item.rjust(self.width, fill) for item in column]
+			elif simple and align == '<':
+				column = [item.ljust(self.width, fill) for item in column]
+			else:
+				column = [_pad(item, self.width, align, fill, self.rfill,
+				               measure)
+				          for item in column]
+
+		return [self.__decorate(item) for item in column]
+
+
+	def __render_array (self, values, numpy):
+		"""Vectorized render_column, for NumPy arrays of any shape."""
+		flat = values.ravel()
+		pattern = self.__column_pattern()
+		kinds = 'iu' if self.vtype == 'd' else 'iuf'
+		if pattern is None or flat.dtype.kind not in kinds:
+			column = [self.render_value(value) for value in flat.tolist()]
+			return numpy.array(column, dtype=str).reshape(values.shape)
+
+		if self.lmilsep:
+			# Grouping has no printf-style pattern, nor vectorized function.
+			column = numpy.array(self.__apply_pattern(pattern, flat.tolist()),
+			                     dtype=str)
+		else:
+			if self.vtype == '%':
+				# In float64, as format does; the array dtype may overflow.
+				flat = flat.astype(numpy.float64) * 100
+			column = numpy.char.mod(pattern, flat)
+
+		if self.separators:
+			# Widened first, as translating keeps the string size of the array.
+			grow = max(len(sep) for sep in self.separators.values())
+			if grow > 1:
+				column = column.astype(f'<U{column.dtype.itemsize // 4 * grow}')
+			column = numpy.char.translate(column, self.separators)
+
+		if self.width:
+			align = self.align or '>'
+			fill = self.fill or ' '
+			measure = display_width if self.config['display_width'] else len
+			simple = len(fill) == 1 and not self.rfill and measure(fill) == 1
+			if simple and align == '>':
+				column = numpy.char.rjust(column, self.width, fill)
+			elif simple and align == '<':
+				column = numpy.char.ljust(column, self.width, fill)
+			else:
+				column = numpy.array([_pad(item, self.width, align, fill,
+				                           self.rfill, measure)
+				                      for item in column.tolist()], dtype=str)
+
+		if self.open_char or self.close_char:
+			column = numpy.char.add(numpy.char.add(self.open_char, column),
+			                        self.close_char)
+		if self.do_color:
+			column = numpy.array([self.__decorate(item, False)
+			                      for item in column.tolist()], dtype=str)
+
+		return column.reshape(values.shape)
 
-		if do_color:
+
+	def __column_pattern (self):
+		"""Returns the printf-style pattern equivalent to the clause specs.
+		Grouped thousands cannot be expressed that way, so the format spec is
+		returned for them instead. Only numeric specs with a fixed width can be
+		rendered by columns; it returns None for anything else.
+		"""
+		if self.convert or self.limit_char or self.relative or self.ralign \
+		   or not self.vtype or self.vtype not in PRINTF_TYPES:
+			return None
+		if self.lmilsep:
+			return self.spec
+		sign = '' if self.sign == '-' else self.sign
+		vtype = 'f%%' if self.vtype == '%' else self.vtype
+		return '%' + sign + self.alter + self.precision + vtype
+
+
+	def __apply_pattern (self, pattern, values):
+		"""Applies a pattern given by __column_pattern to a list of values."""
+		if self.lmilsep:
+			return [format(value, pattern) for value in values]
+		if self.vtype == '%':
+			values = [value * 100 for value in values]
+		return [pattern % value for value in values]
+
+
+	def __native (self):
+		"""Returns the format spec equivalent to the clause specs, or None.
+		Only specs that map one to one onto the format mini-language have it.
+		"""
+		if self.ralign or self.rfill or self.relative or self.limit_char or \
+		   self.replace_list or self.open_char or self.close_char or \
+		   self.do_color or len(self.fill) > 1 or self.fill in ('{', '}') or \
+		   (self.width and self.width < 0):
+			return None
+		width = str(self.width) if self.width else ''
+		return self.fill + self.align + self.sign + self.alter + width + \
+		       self.lmilsep + self.precision + self.vtype
+
+
+	def field (self, counter):
+		"""Returns the str.format field name the clause identifier maps to.
+		Empty clauses take their position from 'counter'. Returns None if the
+		identifier is not a parameter, or can only be known when rendering;
+		autointerpreted ones are taken as the parameter they would be.
+		"""
+		kinds = [kind for kind, _ in self.ids]
+		if self.undef is not None and not kinds:
+			name = self.undef or '0'
+		elif "noid" in kinds:
+			return str(next(counter))
+		elif self.undef is None and kinds == ["param"] * len(kinds):
+			name = self.ids[0][1]
+		else:
+			return None
+		return name if (name.isdigit() or name.isidentifier()) else None
+
+
+	def __decorate (self, final, surround=True):
+		"""Applies surrounding, coloring and styling to a rendered value."""
+		if surround:
+			final = self.open_char + final + self.close_char
+
+		if self.do_color:
 			try:
 				from termcolor import colored
-				final = colored(final, color=set_color, on_color=set_hg,
-				                attrs=set_style)
+				final = colored(final, color=self.set_color,
+				                on_color=self.set_hg, attrs=self.set_style)
 			except ImportError:
 				# TODO: Do you want to import it?
 				raise HumanFormatterError(FATAL_ERROR_NO_TERMCOLOR)
 
-		# Part 4: Saving the formatted with its original line and returning:
-		self.trans.append((original, final))
 		return final
 
 
@@ -575,22 +835,8 @@ class HumanFormatter (object):
 		It returns a dictionary of HFFunction objects.
 		"""
 		cfg = list()
-		## Loading YAML and setting up the functions dictionary:
-		raw_yaml = yaml.load(open(FUNCTIONS_PATH, 'r'), Loader=yaml.FullLoader)
-		ydict = dict()	# <name>: {<args>::list, <call>::str}
-		for foo in raw_yaml:
-			group = foo['def'] if isinstance(foo['def'], list) else [foo['def']]
-			args = foo['args'] if ('args' in foo) else list()
-			call = foo['call'] if ('call' in foo) else None
-			for names in group:
-				names = [n.strip() for n in names.split(',')]
-				main_name = names[0]
-				for name in names:
-					ydict[name] = {
-						'args': args,
-						'call': call or main_name,
-						'by_name': call is None
-					}
+		## Functions and presets dictionaries, loaded just once:
+		ydict, ypresets = _definitions()
 
 		## Placeholding:
 		# User-side placeholders:
@@ -744,6 +990,13 @@ class HumanFormatter (object):
 
 						fitem = HFFunction(key, fitem_args)
 
+					elif fname in PRESETS or fname in ypresets:
+						# Presets expand into their already lexed specs.
+						if any(fargs):
+							raise HumanFormatterError(ERROR_PRESET_ARGS.format(fname))
+						undef = False
+						cfg.extend(self.__preset(fname))
+
 					else:
 						# If name not in fnames, remain undef:
 						undef = True
@@ -765,17 +1018,870 @@ class HumanFormatter (object):
 		return cfg
 
 
+	def __preset (self, name):
+		"""Returns the list of HFFunction a preset expands into.
+		Presets are lexed the first time they are used, and then reused.
+		"""
+		if name not in _LEXED_PRESETS:
+			if name in self.__presets:
+				raise HumanFormatterError(ERROR_PRESET_LOOP.format(name))
+			self.__presets.append(name)
+			specs = PRESETS[name] if name in PRESETS else _definitions()[1][name]
+			fitems = self.__lexer(':' + specs)
+			self.__presets.pop()
+			_LEXED_PRESETS[name] = [fitem for fitem in fitems
+			                        if fitem.key != "noid"]
+		return list(_LEXED_PRESETS[name])
+
+
+
+
+class HFMemo (object):
+	"""Bounded LRU memo of the values rendered by a clause.
+	Keys must identify values exactly, not just compare equal. It is
+	thread-safe, and counts hits, misses and evictions.
+	"""
+	def __init__ (self, maxsize):
+		self.maxsize = maxsize
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.__lock = threading.Lock()
+		self.__items = OrderedDict()	# <key>: <rendered value>
+
+	def get (self, key):
+		"""Returns the rendered value saved for 'key', or None."""
+		with self.__lock:
+			final = self.__items.get(key)
+			if final is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+				self.__items.move_to_end(key)
+			return final
+
+	def put (self, key, final):
+		"""Saves a rendered value, dropping the least recently used ones."""
+		with self.__lock:
+			self.__items[key] = final
+			while len(self.__items) > self.maxsize:
+				self.__items.popitem(last=False)
+				self.evictions += 1
+
+	def info (self):
+		"""Returns a dictionary with the memo counters and sizes."""
+		with self.__lock:
+			total = self.hits + self.misses
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'hit_rate': (self.hits / total) if total else 0.0,
+				'size': len(self.__items),
+				'maxsize': self.maxsize
+			}
+
+
+class HFTemplate (object):
+	"""Pre-parsed hformat template.
+	The line is parsed just once, splitting it into literal text and clauses,
+	and every clause is compiled into an HFClause. Rendering it then only
+	resolves identifiers and formats values. Clauses holding inner clauses
+	depend on what those render to, so they are kept as inner templates, and
+	lexed again on each rendering.
+	"""
+	def __init__ (self, line, config=None, encoding='utf-8'):
+		"""Parses 'line' into its segments.
+		'encoding' is the one used when rendering to bytes.
+		"""
+		self.original = line
+		self.config = HumanFormatter.HFCONFIG if config is None else config
+		self.encoding = encoding
+		self.segments = list()	# Literal text, HFClause or inner HFTemplate.
+		self.fields = list()	# Fields used by the native line, if any.
+		self.__encoded = None	# Literal segments encoded, on first use.
+
+		for literal, clause in HFTemplate.__scan(line):
+			self.__append(literal)
+			if clause is None:
+				continue
+			if '{' in clause or '}' in clause:
+				segment = HFTemplate(clause, self.config)
+				text = segment.static()
+				if text is None or '{' in text or '}' in text:
+					self.segments.append(segment)
+					continue
+				# Every inner clause was folded, so this one can be lexed now.
+				segment = HFClause(text, self.config)
+			else:
+				segment = HFClause(clause, self.config)
+
+			# Constant folding:
+			text = segment.fold()
+			if text is None:
+				self.segments.append(segment)
+			else:
+				self.__append(text)
+
+		self.native = self.translate()
+
+
+	def __append (self, literal):
+		"""Appends literal text, merging it with a previous literal segment."""
+		if not literal:
+			return
+		if self.segments and isinstance(self.segments[-1], str):
+			self.segments[-1] += literal
+		else:
+			self.segments.append(literal)
+
+
+	def static (self):
+		"""Returns the template text if it holds no clause left, or None."""
+		if all(isinstance(segment, str) for segment in self.segments):
+			return ''.join(self.segments)
+		return None
+
+
+	def validate (self):
+		"""Lexes, as far as possible, the clauses left for rendering time.
+		Clauses holding inner clauses can only be lexed once those are
+		rendered, but the specs after them do not depend on it. So, if the last
+		inner clause is followed by a ':', what comes after it is lexed now,
+		raising the same errors it would raise when rendering.
+		"""
+		for segment in self.segments:
+			if not isinstance(segment, HFTemplate):
+				continue
+			last = segment.segments[-1]
+			if isinstance(last, str) and ':' in last:
+				HFClause(':' + last.split(':', 1)[1], self.config)
+			segment.validate()
+
+
+	@staticmethod
+	def __scan (line):
+		"""Splits a given string into literal text and clauses.
+		Identifies every substring enclosed between parenthesis {} - clause.
+		It is capable of distingish inner and outter clauses, and also ignores
+		parentheses that are not clauses. It also provides the escape char '\\',
+		which is kept in the literal text.
+
+		It yields (literal, clause) tuples, where 'clause' is the text between
+		the outter parenthesis, inner clauses included; or None for the text
+		after the last clause.
+		"""
+		inside = False		# True when inside a clause.
+		ignore = 0
+		hop_next = False	# True when a {} char must be ignored.
+		literal = ""
+		subline = ""
+		for char in line:
+			if inside:
+				# This will include the closing '}', be careful.
+				subline += char
+			if hop_next and char in "}{":
+				hop_next = False
+				if not inside:
+					literal += char
+				continue
+			if char == '{':
+				if inside is True:
+					ignore += 1
+				else:
+					inside = True
+			elif char == '}':
+				if not inside:
+					literal += char
+				elif ignore == 0:
+					inside = False
+					yield literal, subline[:-1]
+					literal = subline = ""
+				else:
+					ignore -= 1
+			else:
+				if char == '\\':
+					hop_next = True
+				if not inside:
+					literal += char
+
+		# Error handling:
+		if inside is True:
+			raise HumanFormatterError(ERROR_EXPECTED_CLOSURE.format('}'))
+
+		yield literal, None
+
+
+	def translate (self):
+		"""Returns the str.format line equivalent to the template, or None.
+		It is only given if every clause maps one to one onto the format
+		mini-language, and is identified by a parameter or by position. Both
+		render the same as long as positional arguments are strings or numbers,
+		and named ones are numbers, as hformat evaluates string parameters.
+		"""
+		counter = itertools.count()
+		fields = list()
+		out = list()
+		for segment in self.segments:
+			if isinstance(segment, str):
+				out.append(segment.replace('{', '{{').replace('}', '}}'))
+				continue
+			elif not isinstance(segment, HFClause) or segment.native is None:
+				return None
+			field = segment.field(counter)
+			if field is None:
+				return None
+			fields.append(field)
+			out.append('{' + field + segment.convert + ':' + segment.native + '}')
+
+		self.fields = fields
+		return ''.join(out)
+
+
+	def render (self, *args, **kwargs):
+		"""Renders the template with the given arguments, as hformat does.
+		Contextual identifiers are evaluated in the calling frame, unless
+		another one is given under CALLING_FRAME_KEY.
+		Templates with a native line are rendered by str.format, if the given
+		arguments allow it.
+		"""
+		frame = kwargs.pop(CALLING_FRAME_KEY, None) or \
+		        inspect.currentframe().f_back
+		if self.native is not None and not self.config['display_width'] and \
+		   self.__native_args(args, kwargs):
+			return self.native.format(*args, **kwargs)
+		return ''.join(self.render_segments(args, kwargs, frame, itertools.count()))
+
+
+	def __native_args (self, args, kwargs):
+		"""Checks if the native line renders the same for these arguments."""
+		for field in self.fields:
+			if field.isdigit():
+				if int(field) >= len(args) or \
+				   type(args[int(field)]) not in NATIVE_TYPES:
+					return False
+			elif type(kwargs.get(field)) not in (int, float):
+				return False
+		return True
+
+
+	def render_segments (self, args, kwargs, frame, counter):
+		"""Renders every segment. Returns the list of rendered strings.
+		Arguments are given as HFClause.render takes them, so that several
+		templates can share the same rendering state.
+		"""
+		out = list()
+		for segment in self.segments:
+			if isinstance(segment, str):
+				out.append(segment)
+			else:
+				out.append(self.__render_clause(segment, args, kwargs, frame,
+				                                counter))
+		return out
+
+
+	def __render_clause (self, segment, args, kwargs, frame, counter):
+		"""Renders a clause segment, either an HFClause or an inner template."""
+		if isinstance(segment, HFClause):
+			return segment.render(args, kwargs, frame, counter)
+
+		# Inner clauses go first; only then the outter one can be lexed.
+		line = ''.join(segment.render_segments(args, kwargs, frame, counter))
+		line = line.format(*args, **kwargs)
+		clause = HFClause(line, self.config)
+		return clause.render(args, kwargs, frame, counter)
+
+
+	def render_bytes (self, *args, **kwargs):
+		"""Renders the template straight into bytes, in its encoding."""
+		frame = kwargs.pop(CALLING_FRAME_KEY, None) or \
+		        inspect.currentframe().f_back
+		return b''.join(self.__encode(args, kwargs, frame))
+
+
+	def render_into (self, buffer, *args, **kwargs):
+		"""Renders the template, appending it encoded to 'buffer'.
+		'buffer' is a bytearray, that can be reused between calls. Returns a
+		memoryview over the appended bytes, ready to be sent without copying
+		it. Mind that the buffer cannot grow while the view is alive, so it
+		must be released before rendering into the same buffer again.
+		"""
+		frame = kwargs.pop(CALLING_FRAME_KEY, None) or \
+		        inspect.currentframe().f_back
+		start = len(buffer)
+		for chunk in self.__encode(args, kwargs, frame):
+			buffer += chunk
+		return memoryview(buffer)[start:]
+
+
+	def __encode (self, args, kwargs, frame):
+		"""Renders the template as a sequence of encoded chunks.
+		Literal segments are encoded just once per template, and only the
+		rendered clauses are encoded on each call.
+		"""
+		if self.native is not None and not self.config['display_width'] and \
+		   self.__native_args(args, kwargs):
+			yield self.native.format(*args, **kwargs).encode(self.encoding)
+			return
+
+		if self.__encoded is None:
+			self.__encoded = [segment.encode(self.encoding)
+			                  if isinstance(segment, str) else None
+			                  for segment in self.segments]
+
+		counter = itertools.count()
+		for segment, encoded in zip(self.segments, self.__encoded):
+			if encoded is not None:
+				yield encoded
+			else:
+				yield self.__render_clause(segment, args, kwargs, frame,
+				                           counter).encode(self.encoding)
+
+
+	def memo_info (self):
+		"""Returns the value memo counters of every clause that has one.
+		It is a list of dictionaries, as given by HFMemo.info, each one with
+		the clause under the 'clause' key.
+		"""
+		return [{'clause': segment.original, **segment.memo.info()}
+		        for segment in self.segments
+		        if isinstance(segment, HFClause) and segment.memo is not None]
+
+
+	def format_column (self, values):
+		"""Formats a whole column of values with the template clause.
+		The template must hold a single clause, without inner ones. Its
+		identifier is ignored, as each element of 'values' takes its place, and
+		literal text around it is kept. Check HFClause.render_column.
+		"""
+		index = [i for i, segment in enumerate(self.segments)
+		         if not isinstance(segment, str)]
+		if len(index) != 1 or not isinstance(self.segments[index[0]], HFClause):
+			raise HumanFormatterError(ERROR_COLUMN_CLAUSE)
+
+		prefix = ''.join(self.segments[:index[0]])
+		suffix = ''.join(self.segments[index[0]+1:])
+		column = self.segments[index[0]].render_column(values)
+		if not (prefix or suffix):
+			return column
+		elif isinstance(column, list):
+			return [prefix + item + suffix for item in column]
+		numpy = sys.modules['numpy']
+		return numpy.char.add(numpy.char.add(prefix, column), suffix)
+
+
+class HFTemplateCache (object):
+	"""Process-wide LRU cache of parsed templates.
+	Used by hformat, hfprint and HumanFormatter, so that any line is parsed
+	just once. Templates are keyed by the line and the configuration they
+	were parsed with. Its maximum size is the 'template_cache_size' option,
+	and setting it to 0 or None turns the cache off.
+	It is thread-safe, and counts hits, misses and evictions.
+	"""
+	def __init__ (self):
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.__lock = threading.Lock()
+		self.__templates = OrderedDict()	# <key>: HFTemplate
+
+	def get (self, line, config):
+		"""Returns the parsed template of 'line', parsing it if needed."""
+		maxsize = config['template_cache_size']
+		if not maxsize:
+			return HFTemplate(line, config)
+
+		options = tuple(sorted((key, val) for key, val in config.items()
+		                       if key != 'template_cache_size'))
+		key = (line, options)
+		with self.__lock:
+			template = self.__templates.get(key)
+			if template is not None:
+				self.hits += 1
+				self.__templates.move_to_end(key)
+				return template
+			self.misses += 1
+
+		# Parsed outside the lock; a config snapshot keeps it consistent.
+		template = HFTemplate(line, dict(config))
+		with self.__lock:
+			self.__templates[key] = template
+			while len(self.__templates) > maxsize:
+				self.__templates.popitem(last=False)
+				self.evictions += 1
+		return template
+
+	def clear (self):
+		"""Drops every cached template and resets the counters."""
+		with self.__lock:
+			self.__templates.clear()
+			self.hits = self.misses = self.evictions = 0
+
+	def info (self):
+		"""Returns a dictionary with the cache counters and sizes."""
+		with self.__lock:
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'size': len(self.__templates),
+				'maxsize': HumanFormatter.HFCONFIG['template_cache_size']
+			}
+
+
+TEMPLATE_CACHE = HFTemplateCache()
+
+
+class HFDocument (object):
+	"""hformat template document, rendered in streaming.
+	For large documents, mostly made of literal text. The file is memory
+	mapped and scanned for clauses as bytes, so literal regions are written
+	straight from the map, without decoding them; and each clause is rendered
+	as soon as it is found, through the template cache. Memory use does not
+	depend on the document size.
+	Only encodings where braces and backslashes are always single bytes can be
+	scanned that way; check STREAM_ENCODINGS.
+	"""
+	TOKENS = re.compile(rb'[{}\\]')
+
+	def __init__ (self, path, encoding='utf-8', config=None):
+		"""Receives the document path and its encoding."""
+		if codecs.lookup(encoding).name not in STREAM_ENCODINGS:
+			raise HumanFormatterError(ERROR_DOCUMENT_ENCODING \
+				.format(', '.join(STREAM_ENCODINGS)))
+		self.path = path
+		self.encoding = encoding
+		self.config = HumanFormatter.HFCONFIG if config is None else config
+
+
+	def render (self, out, *args, **kwargs):
+		"""Renders the document into 'out', a binary file-like object.
+		Everything is written in the document encoding. As it is written while
+		being scanned, an unclosed clause raises its error after the text
+		before it has already been written.
+		Returns the number of bytes written.
+		"""
+		frame = kwargs.pop(CALLING_FRAME_KEY, None) or \
+		        inspect.currentframe().f_back
+		counter = itertools.count()
+		written = 0
+		with open(self.path, 'rb') as dfile:
+			if os.fstat(dfile.fileno()).st_size == 0:
+				return written
+			with mmap.mmap(dfile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+				view = memoryview(mm)
+				try:
+					written = self.__stream(mm, view, out, args, kwargs, frame,
+					                        counter)
+				finally:
+					view.release()
+		return written
+
+
+	def __stream (self, mm, view, out, args, kwargs, frame, counter):
+		"""Scans the mapped document, writing it rendered into 'out'.
+		Follows the same rules as HFTemplate parsing.
+		"""
+		written = 0
+		inside = False		# True when inside a clause.
+		ignore = 0
+		hop_next = False	# True when a {} char must be ignored.
+		start = 0			# Start of the pending literal text, or clause.
+		for match in HFDocument.TOKENS.finditer(mm):
+			char = match.group()
+			pos = match.start()
+			if hop_next and char != b'\\':
+				hop_next = False
+				continue
+			if char == b'\\':
+				hop_next = True
+			elif char == b'{':
+				if inside:
+					ignore += 1
+				else:
+					inside = True
+					written += self.__write(out, view[start:pos])
+					start = pos + 1
+			elif inside:
+				if ignore == 0:
+					inside = False
+					clause = bytes(view[start:pos]).decode(self.encoding)
+					template = TEMPLATE_CACHE.get('{' + clause + '}',
+					                              self.config)
+					text = ''.join(template.render_segments(args, kwargs,
+					                                        frame, counter))
+					data = text.encode(self.encoding)
+					out.write(data)
+					written += len(data)
+					start = pos + 1
+				else:
+					ignore -= 1
+
+		# Error handling:
+		if inside is True:
+			raise HumanFormatterError(ERROR_EXPECTED_CLOSURE.format('}'))
+
+		written += self.__write(out, view[start:])
+		return written
+
+
+	@staticmethod
+	def __write (out, chunk):
+		"""Writes a view over the map, releasing it right after."""
+		with chunk:
+			if len(chunk):
+				out.write(chunk)
+			return len(chunk)
+
+
+class HFCatalog (object):
+	"""Catalog of pre-parsed templates, loaded from a file.
+	The file is a YAML or JSON mapping of <key>: <template>, loaded the same
+	way as FUNCTIONS_PATH. Every template is parsed when loading, so the work
+	is done at startup and not on the first use of each one, and any syntax
+	error shows up right away. Unknown functions are always errors here.
+	Parsing can be spread over 'workers' threads, but it is pure Python, so
+	they only parse in parallel on free-threaded builds of Python.
+	Templates are looked up by key, as in a dictionary.
+	"""
+	def __init__ (self, path, workers=None, config=None):
+		"""Loads the catalog at 'path', parsing all of its templates."""
+		self.path = path = os.fspath(path)
+		self.config = dict(HumanFormatter.HFCONFIG if config is None else config)
+		self.config['error_on_unknown_function'] = True
+
+		with open(path, 'r') as cfile:
+			if path.endswith('.json'):
+				entries = json.load(cfile)
+			else:
+				entries = yaml.load(cfile, Loader=yaml.FullLoader)
+		if not isinstance(entries, dict):
+			raise HumanFormatterError(ERROR_CATALOG_FORMAT.format(path))
+
+		if workers:
+			with ThreadPoolExecutor(max_workers=workers) as pool:
+				parsed = list(pool.map(self.__parse, entries.items()))
+		else:
+			parsed = [self.__parse(entry) for entry in entries.items()]
+
+		# Errors are gathered, so all of them are reported at once:
+		errors = [f"\n  - {key}: {error}" for key, _, error in parsed if error]
+		if errors:
+			raise HumanFormatterError(ERROR_CATALOG_ENTRY.format(path,
+			                          ''.join(errors)))
+		self.templates = {key: template for key, template, _ in parsed}
+
+
+	def __parse (self, entry):
+		"""Parses a catalog entry. Returns (key, template, error)."""
+		key, line = entry
+		if not isinstance(line, str):
+			return key, None, f"expected a string, not '{type(line).__name__}'"
+		try:
+			template = HFTemplate(line, self.config)
+			template.validate()
+			return key, template, None
+		except Exception as error:
+			return key, None, f"{type(error).__name__}: {error}"
+
+
+	def __getitem__ (self, key):
+		return self.templates[key]
+
+	def __contains__ (self, key):
+		return key in self.templates
+
+	def __iter__ (self):
+		return iter(self.templates)
+
+	def __len__ (self):
+		return len(self.templates)
+
+	def render (self, key, *args, **kwargs):
+		"""Renders the template under 'key', as hformat does."""
+		kwargs.setdefault(CALLING_FRAME_KEY, inspect.currentframe().f_back)
+		return self.templates[key].render(*args, **kwargs)
+
+
+class HFMessage (object):
+	"""Deferred hformat message, for logging.
+	Wraps a line and its arguments, so that a call such as
+		logger.debug(HFMessage("{@elapsed:dec(2)} seconds"))
+	just takes a reference to the calling frame, for contextual identifiers.
+	Parsing and rendering wait until a handler asks for the message, which
+	never happens if the level is disabled.
+	"""
+	__slots__ = ('line', 'args', 'kwargs', 'frame')
+
+	def __init__ (self, line, *args, **kwargs):
+		self.line = line
+		self.args = args
+		self.kwargs = kwargs
+		self.frame = sys._getframe(1)
+
+	def __str__ (self):
+		"""Renders the message, through the template cache."""
+		template = TEMPLATE_CACHE.get(self.line, HumanFormatter.HFCONFIG)
+		return template.render(*self.args, **{**self.kwargs,
+		                       CALLING_FRAME_KEY: self.frame})
+
+
+class HFAdapter (logging.LoggerAdapter):
+	"""Logger adapter whose messages are hformat lines.
+	It marks its records under RECORD_KEY, which is what tells HFFormatter to
+	render them. Records can also be marked by hand, logging them with
+		extra={RECORD_KEY: True}
+	"""
+	def process (self, msg, kwargs):
+		kwargs['extra'] = {**(self.extra or dict()),
+		                   **(kwargs.get('extra') or dict()), RECORD_KEY: True}
+		return msg, kwargs
+
+
+class HFFormatter (logging.Formatter):
+	"""Logging formatter for records whose message is an hformat line.
+	With it, a call such as
+		HFAdapter(logger).debug("{:dec(2)} seconds", elapsed)
+	is only parsed and rendered when a handler emits the record, so disabled
+	levels cost the same as with %-style messages. Lines are parsed once, and
+	shared across records through the template cache. A single mapping
+	argument is taken both as the first positional and as the named arguments.
+	Only records marked under RECORD_KEY are rendered, as hformat evaluates
+	identifiers; any other one keeps the usual %-style formatting, so records
+	from other code are not affected.
+	Contextual identifiers are evaluated in the frame that logged the record,
+	as long as the handler runs synchronously; for any other case, use
+	HFMessage.
+	"""
+	def format (self, record):
+		"""Formats the record, rendering its message with hformat if marked."""
+		if not (getattr(record, RECORD_KEY, False) and
+		        isinstance(record.msg, str)):
+			return super().format(record)
+
+		msg, args = record.msg, record.args
+		record.msg = self.render(record)
+		record.args = None
+		try:
+			return super().format(record)
+		finally:
+			record.msg, record.args = msg, args
+
+	def render (self, record):
+		"""Renders the hformat line of the record with its arguments."""
+		args = record.args or tuple()
+		kwargs = dict()
+		if isinstance(args, dict):
+			# Logging unpacks a single mapping argument; it can be either.
+			args, kwargs = (args,), dict(args)
+
+		# Looking for the logging frame, still in the stack:
+		frame = sys._getframe(1)
+		while frame is not None:
+			if frame.f_code.co_filename == record.pathname and \
+			   frame.f_lineno == record.lineno:
+				kwargs[CALLING_FRAME_KEY] = frame
+				break
+			frame = frame.f_back
+
+		template = TEMPLATE_CACHE.get(record.msg, HumanFormatter.HFCONFIG)
+		return template.render(*args, **kwargs)
+
+
 ################################################################################
 
 #
 # Functions:
 #
+@functools.lru_cache(maxsize=None)
+def _definitions ():
+	"""Loads the functions and presets from FUNCTIONS_PATH, just once.
+	Returns both dictionaries:
+	  - functions: <name>: {<args>::list, <call>::str, <by_name>::bool}
+	  - presets: <name>: <specs>::str
+	"""
+	with open(FUNCTIONS_PATH, 'r') as yfile:
+		raw_yaml = yaml.load(yfile, Loader=yaml.FullLoader)
+
+	ydict = dict()
+	presets = dict()
+	for foo in raw_yaml:
+		if 'preset' in foo:
+			presets[foo['preset']] = foo['specs']
+			continue
+		group = foo['def'] if isinstance(foo['def'], list) else [foo['def']]
+		args = foo['args'] if ('args' in foo) else list()
+		call = foo['call'] if ('call' in foo) else None
+		for names in group:
+			names = [n.strip() for n in names.split(',')]
+			main_name = names[0]
+			for name in names:
+				ydict[name] = {
+					'args': args,
+					'call': call or main_name,
+					'by_name': call is None
+				}
+	return ydict, presets
+
+def _char_width (char):
+	"""Returns the number of terminal columns used by a single char."""
+	if unicodedata.combining(char) or \
+	   unicodedata.category(char) in ('Mn', 'Me', 'Cf', 'Cc'):
+		return 0
+	return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+@functools.lru_cache(maxsize=1024)
+def _astral_width (char):
+	"""Cached width for chars outside the Basic Multilingual Plane."""
+	return _char_width(char)
+
+_WIDTH_TABLE = None		# Widths for every BMP code point, built on first use.
+
+def display_width (text):
+	"""Returns the number of terminal columns 'text' takes up.
+	East Asian wide and fullwidth chars count as two columns, while combining
+	marks and format chars count as none. Widths are looked up in a table
+	precomputed once for the whole Basic Multilingual Plane.
+	"""
+	global _WIDTH_TABLE
+	if text.isascii():
+		return len(text)
+	if _WIDTH_TABLE is None:
+		_WIDTH_TABLE = bytes(_char_width(chr(cp)) for cp in range(0x10000))
+	table = _WIDTH_TABLE
+	return sum(table[ord(c)] if ord(c) < 0x10000 else _astral_width(c)
+	           for c in text)
+
+def _is_constant (text):
+	"""Checks if the casting of a literal identifier always gives the same.
+	Literals are evaluated when casting, so only Python literals, text that is
+	not Python and bare names that are not builtins are taken as constants.
+	"""
+	try:
+		node = ast.parse(text, mode='eval').body
+	except (SyntaxError, ValueError):
+		return True
+
+	if isinstance(node, ast.Name):
+		return not hasattr(builtins, node.id)
+	try:
+		ast.literal_eval(node)
+		return True
+	except Exception:
+		return False
+
+def _bounded_repr (value, size, seen=None):
+	"""Returns repr(value)[:size], building no more of it than needed.
+	Handles str, bytes, bytearray and the built-in containers, whose items are
+	also bounded; for any other type, returns None. 'seen' holds the ids of
+	the containers being represented, for recursive ones.
+	"""
+	kind = type(value)
+	if size <= 0:
+		return ''
+
+	if kind in (str, bytes, bytearray):
+		if len(value) <= size:
+			return repr(value)[:size]
+		# Quotes are chosen over the whole value, as repr() does; the single
+		# one is escaped if it was chosen, and always by bytearray.
+		quote, single = ("'", '"') if kind is str else (b"'", b'"')
+		dquote = (quote in value) and (single not in value)
+		text = repr(bytes(value[:size]) if kind is bytearray else value[:size])
+		start = text.index(text[-1])
+		body = text[start+1:-1]
+		if text[-1] == '"' and (kind is bytearray or not dquote):
+			body = body.replace("'", "\\'")
+		head = {str: '', bytes: 'b', bytearray: 'bytearray(b'}[kind]
+		return (head + ('"' if dquote else "'") + body)[:size]
+
+	if kind not in (list, tuple, dict, set, frozenset):
+		return None
+
+	seen = set() if seen is None else seen
+	if id(value) in seen:
+		return {list: '[...]', tuple: '(...)', dict: '{...}',
+		        set: 'set(...)', frozenset: 'frozenset(...)'}[kind]
+	if not value:
+		return repr(value)[:size]
+
+	opening, closing = {list: ('[', ']'), tuple: ('(', ')'), dict: ('{', '}'),
+	                    set: ('{', '}'), frozenset: ('frozenset({', '})')}[kind]
+	if kind is tuple and len(value) == 1:
+		closing = ',)'
+
+	seen.add(id(value))
+	parts = [opening]
+	length = len(opening)
+	for i, item in enumerate(value):
+		if length >= size:
+			break
+		if i:
+			parts.append(', ')
+			length += 2
+		if kind is dict:
+			text = _bounded_repr(item, size - length, seen)
+			text = (repr(item) if text is None else text) + ': '
+			parts.append(text)
+			length += len(text)
+			item = value[item]
+		text = _bounded_repr(item, size - length, seen)
+		text = repr(item) if text is None else text
+		parts.append(text)
+		length += len(text)
+	else:
+		parts.append(closing)
+	seen.discard(id(value))
+
+	return ''.join(parts)[:size]
+
+def _pad (text, width, align, fill='', rfill=False, measure=len):
+	"""Pads 'text' up to 'width' columns, following str.format alignment.
+	'fill' may be a multi-char string, which is repeated along the padding;
+	or, if 'rfill' is set, a set of chars to choose randomly from.
+	"""
+	size = width - measure(text)
+	if size <= 0:
+		return text
+	fill = fill or ' '
+	if measure is not len and any(measure(char) != 1 for char in fill):
+		# Wide or zero-width fill chars; each side is measured on its own.
+		left = size//2 if align == '^' else (0 if align == '<' else size)
+		return _fill(fill, left, rfill, measure) + text + \
+		       _fill(fill, size - left, rfill, measure)
+	if rfill:
+		chars = ''.join(random.choice(fill) for _ in range(size))
+	else:
+		chars = (fill * (size//len(fill) + 1))[:size]
+
+	if align == '<':
+		return text + chars
+	elif align == '>':
+		return chars + text
+	return chars[:size//2] + text + chars[size//2:]
+
+def _fill (fill, size, rfill, measure):
+	"""Builds exactly 'size' columns of padding out of the chars of 'fill'.
+	Chars that do not fit in the columns left, or that take none, are
+	replaced by spaces.
+	"""
+	chars = list()
+	for i in itertools.count():
+		if size <= 0:
+			return ''.join(chars)
+		char = random.choice(fill) if rfill else fill[i % len(fill)]
+		columns = measure(char)
+		if columns == 0 or columns > size:
+			char, columns = ' ', 1
+		chars.append(char)
+		size -= columns
+
 def hformat (line, *args, **kwargs):
 	"""Function-style Human Formatter.
 	It creates an object HumanFormatter, runs it, and returns the result.
 	It also identifies the calling module.
 	"""
-	kwargs[CALLING_FRAME_KEY] = inspect.stack()[1].frame
+	kwargs[CALLING_FRAME_KEY] = inspect.currentframe().f_back
 	obj = HumanFormatter(line, *args, **kwargs)
 	return obj.final
 
@@ -791,5 +1897,44 @@ def hfconfig (*args, **kwargs):
 			if key in HumanFormatter.HFCONFIG.keys():
 				HumanFormatter.HFCONFIG[key] = val
 
+def hfpreset (name, specs):
+	"""Registers the preset 'name', which expands into 'specs'.
+	'specs' is written as in any clause, e.g. "decimal(2), right(14)". It is
+	lexed right away, so errors are raised here, unknown functions included.
+	"""
+	if name in _definitions()[0]:
+		raise HumanFormatterError(ERROR_PRESET_NAME.format(name))
+
+	# Everything is restored if the new specs are wrong:
+	old, lexed = PRESETS.get(name), dict(_LEXED_PRESETS)
+	PRESETS[name] = specs
+	_LEXED_PRESETS.clear()
+	try:
+		HFClause(':' + name, {**HumanFormatter.HFCONFIG,
+		                      'error_on_unknown_function': True})
+	except:
+		if old is None:
+			del PRESETS[name]
+		else:
+			PRESETS[name] = old
+		_LEXED_PRESETS.clear()
+		_LEXED_PRESETS.update(lexed)
+		raise
+	TEMPLATE_CACHE.clear()		# Parsed lines may have used the old one.
+
+def translate (line):
+	"""Returns the str.format line equivalent to hformatted 'line'.
+	Returns None if it has no equivalent. Check HFTemplate.translate.
+	"""
+	return TEMPLATE_CACHE.get(line, HumanFormatter.HFCONFIG).native
+
+def hfcache_info ():
+	"""Returns the counters of the hformat template cache."""
+	return TEMPLATE_CACHE.info()
+
+def hfcache_clear ():
+	"""Empties the hformat template cache."""
+	TEMPLATE_CACHE.clear()
+
 
 ################################################################################
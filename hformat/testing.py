@@ -119,3 +119,212 @@ if __name__ == "__main__":
 	         "Bosnia y Herzegovina")
 	print(out)
 
+
+
+	# Single rendering:
+	out = hf("RENDER - OWN FORMAT [{:width(5)}]", True)
+	expect = "RENDER - OWN FORMAT [    1]"
+	cmp_test(out, expect)
+
+	out = hf("RENDER - LITERAL NAMES {?string} {?json:center(8, *)}")
+	expect = "RENDER - LITERAL NAMES string **json**"
+	cmp_test(out, expect)
+
+	# Display width:
+	hfconfig(display_width=True)
+	out = hf("WIDTH - DISPLAY [{:width(6), fill(*)}]", "漢字")
+	expect = "WIDTH - DISPLAY [漢字**]"
+	cmp_test(out, expect)
+
+	out = hf("WIDTH - DISPLAY FILL [{:width(5), fill(漢)}]", "a")
+	expect = "WIDTH - DISPLAY FILL [a漢漢]"
+	cmp_test(out, expect)
+	hfconfig(display_width=False)
+
+	# Templates and columns:
+	template = HFTemplate("{:dec(2, ',')}")
+	out = "TEMPLATE - RENDER " + template.render(3.14159)
+	expect = "TEMPLATE - RENDER 3,14"
+	cmp_test(out, expect)
+
+	out = "TEMPLATE - COLUMN " + ' '.join(template.format_column([1.5, 22.25]))
+	expect = "TEMPLATE - COLUMN 1,50 22,25"
+	cmp_test(out, expect)
+
+	money = HFTemplate("{:float(',', '.'), decimal(2), right(14)} EUR")
+	out = "TEMPLATE - COLUMN |" + '|'.join(money.format_column([1234567.891,
+	                                                            -5]))
+	expect = "TEMPLATE - COLUMN |  1.234.567,89 EUR|         -5,00 EUR"
+	cmp_test(out, expect)
+
+	try:
+		import numpy
+	except ImportError:
+		print("TEMPLATE - NUMPY COLUMN skipped, needs numpy\n")
+	else:
+		for line in ("{:dec(2, ',')}", "{:float(',', '.'), decimal(2)}",
+		             "{:int('.'), width(10, *)}", "{:exp, sign}"):
+			values = [1.5, 22.25, -1234567.125] if 'int' not in line \
+			         else [7, -22, 1234567]
+			out = "TEMPLATE - NUMPY COLUMN " + ' '.join(
+				HFTemplate(line).format_column(numpy.array(values)).tolist())
+			expect = "TEMPLATE - NUMPY COLUMN " + ' '.join(
+				HFTemplate(line).render(value) for value in values)
+			cmp_test(out, expect)
+
+		out = "TEMPLATE - NUMPY PERCENT " + ' '.join(HFTemplate(
+			"{:per, dec(0)}").format_column(numpy.array([30000000],
+			                                dtype=numpy.int32)).tolist())
+		expect = "TEMPLATE - NUMPY PERCENT 3000000000%"
+		cmp_test(out, expect)
+
+	# Folding:
+	out = "FOLDING - " + HFTemplate("{?hola:center(8, *)} {:dec(1)}").segments[0]
+	expect = "FOLDING - **hola** "
+	cmp_test(out, expect)
+
+	# Template cache:
+	hfcache_clear()
+	hf("CACHE {}", 1)
+	hf("CACHE {}", 2)
+	info = hfcache_info()
+	out = hf("CACHE - {hits} hits, {misses} misses", **info)
+	expect = "CACHE - 1 hits, 1 misses"
+	cmp_test(out, expect)
+
+	# Native rendering:
+	out = "NATIVE - " + translate("{:right(8), dec(2)} {name:int}")
+	expect = "NATIVE - {0:>8.2f} {name:d}"
+	cmp_test(out, expect)
+
+	out = "NATIVE - " + str(translate("{:surround([])}"))
+	expect = "NATIVE - None"
+	cmp_test(out, expect)
+
+	# Bytes and buffers:
+	template = HFTemplate("BYTES - {:dec(1)} €", encoding='utf-8')
+	out = template.render_bytes(2.25).decode('utf-8')
+	expect = "BYTES - 2.2 €"
+	cmp_test(out, expect)
+
+	buffer = bytearray(b"BYTES - INTO ")
+	view = template.render_into(buffer, 4.5)
+	out = bytes(view).decode('utf-8')
+	view.release()
+	expect = "BYTES - 4.5 €"
+	cmp_test(out, expect)
+
+	# Logging:
+	import io, logging
+	formatter = HFFormatter("%(levelname)s %(message)s")
+	record = logging.LogRecord("test", logging.INFO, __file__, 0,
+	                           "LOGGING - {:dec(2)} seconds", (1.23456,), None)
+	record.hformat = True
+	out = formatter.format(record)
+	expect = "INFO LOGGING - 1.23 seconds"
+	cmp_test(out, expect)
+
+	record = logging.LogRecord("test", logging.INFO, __file__, 0,
+	                           "LOGGING - {%amount:dec(2)}",
+	                           ({'amount': 3.14159},), None)
+	record.hformat = True
+	out = formatter.format(record)
+	expect = "INFO LOGGING - 3.14"
+	cmp_test(out, expect)
+
+	record = logging.LogRecord("test", logging.INFO, __file__, 0,
+	                           "LOGGING - NOT MARKED /api/{beta} %s", ('x',),
+	                           None)
+	out = formatter.format(record)
+	expect = "INFO LOGGING - NOT MARKED /api/{beta} x"
+	cmp_test(out, expect)
+
+	stream = io.StringIO()
+	handler = logging.StreamHandler(stream)
+	handler.setFormatter(formatter)
+	logger = logging.getLogger("hformat.testing")
+	logger.addHandler(handler)
+	logger.propagate = False
+	HFAdapter(logger).warning("LOGGING - ADAPTER {beta:center(8, *)}")
+	out = stream.getvalue().strip()
+	expect = "WARNING LOGGING - ADAPTER **HOLA**"
+	cmp_test(out, expect)
+
+	out = str(HFMessage("LOGGING - MESSAGE {:center(7, *)}", "hi"))
+	expect = "LOGGING - MESSAGE **hi***"
+	cmp_test(out, expect)
+
+	# Presets:
+	hfpreset("money", "float(',', '.'), decimal(2), right(14)")
+	out = hf("PRESETS - [{:money}]", 1234.5)
+	expect = "PRESETS - [      1.234,50]"
+	cmp_test(out, expect)
+
+	try:
+		hfpreset("wrong", "nosuch(3), right(5)")
+		out = "PRESETS - UNKNOWN accepted"
+	except HumanFormatterError:
+		out = "PRESETS - UNKNOWN rejected"
+	expect = "PRESETS - UNKNOWN rejected"
+	cmp_test(out, expect)
+
+	try:
+		hfpreset("money", "nosuch")
+	except HumanFormatterError:
+		pass
+	out = hf("PRESETS - KEPT [{:money}]", 1234.5)
+	expect = "PRESETS - KEPT [      1.234,50]"
+	cmp_test(out, expect)
+
+	# Documents:
+	import io, os, tempfile
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, "document.txt")
+		with open(path, 'w', encoding='utf-8') as dfile:
+			dfile.write("DOCUMENT - {:dec(1)} and {?ok:surround([])}")
+		stream = io.BytesIO()
+		HFDocument(path).render(stream, 0.25)
+		out = stream.getvalue().decode('utf-8')
+		expect = "DOCUMENT - 0.2 and [ok]"
+		cmp_test(out, expect)
+
+	# Value memo:
+	hfconfig(value_cache_size=8)
+	template = HFTemplate("{:dec(2), surround([])}")
+	template.render(1.5)
+	template.render(1.5)
+	out = hf("MEMO - {hits} hits, {misses} misses", **template.memo_info()[0])
+	expect = "MEMO - 1 hits, 1 misses"
+	cmp_test(out, expect)
+	hfconfig(value_cache_size=0)
+
+	# Limited conversions:
+	out = hf("LIMIT - REPR {:repr, limit(12)}", list(range(10**6)))
+	expect = "LIMIT - REPR [0, 1, 2, 3,"
+	cmp_test(out, expect)
+
+	# Catalogs:
+	import os, pathlib, tempfile
+	with tempfile.TemporaryDirectory() as tmp:
+		path = os.path.join(tmp, "catalog.yml")
+		with open(path, 'w') as cfile:
+			cfile.write('greet: "CATALOG - {name:center(+2, *)}"\n'
+			            'nested: "CATALOG - {{:dec(2)}:right(6)}"\n')
+		catalog = HFCatalog(pathlib.Path(path))
+		out = catalog.render('greet', name="Ana")
+		expect = "CATALOG - *Ana*"
+		cmp_test(out, expect)
+
+		out = catalog['nested'].render(3.14159)
+		expect = "CATALOG -   3.14"
+		cmp_test(out, expect)
+
+		with open(path, 'a') as cfile:
+			cfile.write('wrong: "{{:dec(2)}:nosuch}"\n')
+		try:
+			HFCatalog(path)
+			out = "CATALOG - NESTED UNKNOWN accepted"
+		except HumanFormatterError:
+			out = "CATALOG - NESTED UNKNOWN rejected"
+		expect = "CATALOG - NESTED UNKNOWN rejected"
+		cmp_test(out, expect)